@@ -1,19 +1,34 @@
 import random
 import argparse
+import functools
+from collections import defaultdict, deque
+import math
+from typing import Deque, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
 import cv2
 from tqdm import tqdm
 import numpy as np
 import numpy.typing as npt
 import torch
-from decord import VideoReader, cpu
+from decord import DECORDError, VideoReader, cpu, gpu
 from torch.nn import functional as F
-from pytorchvideo.transforms import ShortSideScale
-from torchvision.transforms import Lambda, Compose
-from torchvision.transforms._transforms_video import CenterCropVideo
 import sys
-from torch.utils.data import Dataset, DataLoader, Subset
+from torch.utils.data import Dataset, DataLoader, Sampler, Subset
+from torch.utils.dlpack import from_dlpack
 import os
 
+try:
+    from numba import njit
+except ImportError:
+    # without numba the frame plan helpers simply run as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+try:
+    from torchaudio.io import StreamWriter
+except ImportError:
+    StreamWriter = None
+
 sys.path.append(".")
 from opensora.models.ae.videobase import CausalVAEModel
 from opensora.models.ae.videobase.modules.conv import BlockwiseConv3d
@@ -21,6 +36,8 @@ import torch.nn as nn
 
 
 def replace_conv3d_with_blockwise(model):
+    # remember the widest temporal kernel so process_in_chunks can size its overlap
+    recv_field_t = 1
     for name, module in model.named_children():
         if isinstance(module, nn.Conv3d):
             new_module = BlockwiseConv3d(
@@ -36,20 +53,43 @@ def replace_conv3d_with_blockwise(model):
                 module.bias.data if module.bias is not None else None,
             )
             setattr(model, name, new_module)
+            recv_field_t = max(recv_field_t, module.kernel_size[0])
         else:
-            replace_conv3d_with_blockwise(module)
+            recv_field_t = max(recv_field_t, replace_conv3d_with_blockwise(module))
+    model.recv_field_t = recv_field_t
+    return recv_field_t
+
+
+def _temporal_receptive_field(model: nn.Module) -> int:
+    recv_field_t: Optional[int] = getattr(model, "recv_field_t", None)
+    if recv_field_t is None:
+        recv_field_t = max(
+            (m.kernel_size[0] for m in model.modules() if isinstance(m, nn.Conv3d)),
+            default=1,
+        )
+    return int(recv_field_t)
 
 
 def process_in_chunks(
     video_data: torch.Tensor,
     model: nn.Module,
-    chunk_size: int,
-    overlap: int,
-    device: str,
+    chunk_size: Optional[int] = None,
+    overlap: Optional[int] = None,
+    device: str = "cuda",
+    min_chunk_size: int = 16,
 ):
+    if overlap is None:
+        # heuristic: overlap by the widest temporal kernel minus one; the stacked causal
+        # convs and temporal downsamples actually see much further across a seam
+        overlap = _temporal_receptive_field(model) - 1
+    if chunk_size is None:
+        # smallest chunk so that every non-final chunk is 4k + 1 frames long
+        chunk_size = min_chunk_size + (-(min_chunk_size + overlap - 1)) % 4
     assert (chunk_size + overlap - 1) % 4 == 0
     num_frames = video_data.size(2)
-    output_chunks = []
+    dtype = next(model.parameters()).dtype
+    output: Optional[torch.Tensor] = None
+    written = 0
 
     start = 0
     while start < num_frames:
@@ -58,28 +98,40 @@ def process_in_chunks(
             end += overlap
         chunk = video_data[:, :, start:end, :, :]
 
+        # uint8 clips (e.g. from read_video) cross to the device before normalizing
+        chunk = chunk.to(device, non_blocking=True)
+        if chunk.dtype == torch.uint8:
+            chunk = _normalize_video(chunk, dtype)
+        else:
+            chunk = chunk.to(dtype)
         with torch.no_grad():
-            chunk = chunk.half().to(device)
             latents = model.encode(chunk)
-            recon_chunk = model.decode(latents.sample().half()).cpu().float()
+            recon_chunk = model.decode(latents.sample())
 
-        if output_chunks:
-            overlap_step = min(overlap, recon_chunk.shape[2])
-            overlap_tensor = (
-                output_chunks[-1][:, :, -overlap_step:] * 1 / 4
-                + recon_chunk[:, :, :overlap_step] * 3 / 4
+        if output is None:
+            output = torch.empty(
+                (*recon_chunk.shape[:2], num_frames, *recon_chunk.shape[3:]),
+                dtype=recon_chunk.dtype,
+                device=recon_chunk.device,
             )
-            output_chunks[-1] = torch.cat(
-                (output_chunks[-1][:, :, :-overlap], overlap_tensor), dim=2
+        chunk_end = min(start + recon_chunk.shape[2], num_frames)
+        overlap_end = min(written, chunk_end)
+        # frames already written by the previous chunk are blended 1:3 in place
+        if overlap_end > start:
+            output[:, :, start:overlap_end].lerp_(
+                recon_chunk[:, :, : overlap_end - start], 3 / 4
             )
-            if end < num_frames:
-                output_chunks.append(recon_chunk[:, :, overlap:])
-            else:
-                output_chunks.append(recon_chunk[:, :, :, :, :])
-        else:
-            output_chunks.append(recon_chunk)
+        output[:, :, overlap_end:chunk_end] = recon_chunk[
+            :, :, overlap_end - start : chunk_end - start
+        ]
+        written = max(written, chunk_end)
         start += chunk_size
-    return torch.cat(output_chunks, dim=2)
+    assert output is not None, "process_in_chunks needs at least one input frame"
+    # a single pinned D2H copy for the whole video
+    output = output[:, :, :written].to("cpu", non_blocking=True)
+    if recon_chunk.is_cuda:
+        torch.cuda.current_stream(recon_chunk.device).synchronize()
+    return output
 
 
 def array_to_video(
@@ -89,47 +141,145 @@ def array_to_video(
     fourcc = cv2.VideoWriter_fourcc(*"mp4v")
     video_writer = cv2.VideoWriter(output_file, fourcc, float(fps), (width, height))
 
-    for image in image_array:
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        video_writer.write(image_rgb)
+    # one RGB -> BGR flip for the whole clip instead of a cvtColor per frame
+    bgr_array = np.ascontiguousarray(image_array[..., ::-1])
+    for image_bgr in bgr_array:
+        video_writer.write(image_bgr)
 
     video_writer.release()
 
 
+def _to_uint8_frames(x: torch.Tensor, channels_last: bool = True) -> torch.Tensor:
+    # (..., C, T, H, W) in [-1, 1] -> (..., T, H, W, C) uint8, on the device holding x;
+    # with channels_last=False -> (..., T, C, H, W), the layout NVENC consumes
+    x = x.detach().to(torch.float32, copy=True).clamp_(-1, 1).add_(1).mul_(127.5)
+    x = x.to(torch.uint8)
+    if channels_last:
+        return x.movedim(-4, -1).contiguous()
+    return x.transpose(-4, -3).contiguous()
+
+
 def custom_to_video(
     x: torch.Tensor, fps: float = 2.0, output_file: str = "output_video.mp4"
 ) -> None:
-    x = x.detach().cpu()
-    x = torch.clamp(x, -1, 1)
-    x = (x + 1) / 2
-    x = x.permute(1, 2, 3, 0).numpy()
-    x = (255 * x).astype(np.uint8)
+    x = _to_uint8_frames(x).cpu().numpy()
     array_to_video(x, fps=fps, output_file=output_file)
     return
 
 
-def read_video(video_path: str, num_frames: int, sample_rate: int) -> torch.Tensor:
-    decord_vr = VideoReader(video_path, ctx=cpu(0), num_threads=8)
-    total_frames = len(decord_vr)
-    sample_frames_len = sample_rate * num_frames
+def array_to_video_nvenc(
+    frames: torch.Tensor, fps: float = 30.0, output_file: str = "output_video.mp4"
+) -> None:
+    # (T, C, H, W) uint8 on a CUDA device, NVENC reads the frames without a D2H copy
+    num_frames, channels, height, width = frames.shape
+    writer = StreamWriter(output_file)
+    writer.add_video_stream(
+        frame_rate=fps,
+        width=width,
+        height=height,
+        format="rgb24",
+        encoder="h264_nvenc",
+        encoder_format="yuv444p",
+        hw_accel=f"cuda:{frames.device.index}",
+    )
+    with writer.open():
+        writer.write_video_chunk(0, frames)
+
+
+def _copy_to_host(x: torch.Tensor, copy_stream=None):
+    # D2H on a side stream into pinned memory; the returned event marks the copy done
+    if copy_stream is None:
+        return x.cpu(), None
+    host = torch.empty(x.shape, dtype=x.dtype, pin_memory=True)
+    copy_stream.wait_stream(torch.cuda.current_stream(x.device))
+    with torch.cuda.stream(copy_stream):
+        host.copy_(x, non_blocking=True)
+        x.record_stream(copy_stream)
+        copy_done = torch.cuda.Event()
+        copy_done.record(copy_stream)
+    return host, copy_done
+
+
+def _save_videos(frames, copy_done, file_names, output_dir, fps, use_nvenc):
+    if copy_done is not None:
+        copy_done.synchronize()
+    for video_frames, file_name in zip(frames, file_names):
+        output_path = os.path.join(output_dir, file_name)
+        if use_nvenc:
+            array_to_video_nvenc(video_frames, fps=fps, output_file=output_path)
+        else:
+            array_to_video(video_frames.numpy(), fps=fps, output_file=output_path)
 
-    if total_frames > sample_frames_len:
-        s = 0
-        e = s + sample_frames_len
-        num_frames = num_frames
-    else:
-        s = 0
-        e = total_frames
-        num_frames = int(total_frames / sample_frames_len * num_frames)
+
+def _get_decord_ctx(device: str):
+    torch_device = torch.device(device)
+    if torch_device.type == "cuda":
+        return gpu(torch_device.index if torch_device.index is not None else 0)
+    return cpu(0)
+
+
+_DECODE_THREADS = 4
+_PARALLEL_DECODE_MIN_FRAMES = 64
+
+
+@functools.lru_cache(maxsize=None)
+def _get_decode_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=_DECODE_THREADS)
+
+
+def _to_torch(frames) -> torch.Tensor:
+    # zero-copy hand-off through DLPack; decord's global bridge is left untouched so
+    # other datasets importing this module keep getting NDArrays from get_batch
+    return from_dlpack(frames.to_dlpack())
+
+
+def _decode_frames(
+    decord_vr: VideoReader,
+    video_path: str,
+    frame_id_list: npt.NDArray,
+    device: str = "cpu",
+) -> torch.Tensor:
+    # every extra slot is another NVDEC session, so GPU decoding stays on one reader
+    if (
+        len(frame_id_list) < _PARALLEL_DECODE_MIN_FRAMES
+        or torch.device(device).type == "cuda"
+    ):
+        return _to_torch(decord_vr.get_batch(frame_id_list))
+
+    # FFmpeg releases the GIL, but a reader is not thread safe: one reader per slot.
+    # Extra slots split the cores instead of each starting FFmpeg's default thread
+    # count; this has not been benchmarked against one multithreaded get_batch
+    slot_threads = max(1, (os.cpu_count() or 1) // _DECODE_THREADS)
+
+    def decode_range(slot, sub_frame_id_list):
+        slot_vr = (
+            decord_vr
+            if slot == 0
+            else VideoReader(video_path, ctx=cpu(0), num_threads=slot_threads)
+        )
+        return _to_torch(slot_vr.get_batch(sub_frame_id_list))
+
+    sub_frame_id_lists = np.array_split(frame_id_list, _DECODE_THREADS)
+    video_data = _get_decode_pool().map(
+        decode_range, range(_DECODE_THREADS), sub_frame_id_lists
+    )
+    return torch.cat(list(video_data), dim=0)
+
+
+def read_video(
+    video_path: str, num_frames: int, sample_rate: int, device: str = "cpu"
+) -> torch.Tensor:
+    decord_vr = VideoReader(video_path, ctx=_get_decord_ctx(device), num_threads=8)
+    total_frames = len(decord_vr)
+    frame_id_list = _compute_frame_plan(total_frames, num_frames, sample_rate, 1)
+    if total_frames <= sample_rate * num_frames:
         print(
-            f"sample_frames_len {sample_frames_len}, only can sample {num_frames * sample_rate}",
+            f"sample_frames_len {sample_rate * num_frames}, only can sample {len(frame_id_list) * sample_rate}",
             video_path,
             total_frames,
         )
 
-    frame_id_list = np.linspace(s, e - 1, num_frames, dtype=int)
-    video_data = decord_vr.get_batch(frame_id_list).asnumpy()
-    video_data = torch.from_numpy(video_data)
+    video_data = _to_torch(decord_vr.get_batch(frame_id_list))
     video_data = video_data.permute(3, 0, 1, 2)  # (T, H, W, C) -> (C, T, H, W)
     return video_data
 
@@ -142,6 +292,7 @@ class RealVideoDataset(Dataset):
         sample_rate=1,
         crop_size=None,
         resolution=128,
+        decode_device="cpu",
     ) -> None:
         super().__init__()
         self.real_video_files = self._combine_without_prefix(real_video_dir)
@@ -149,6 +300,7 @@ class RealVideoDataset(Dataset):
         self.sample_rate = sample_rate
         self.crop_size = crop_size
         self.short_size = resolution
+        self.decode_device = decode_device
 
     def __len__(self):
         return len(self.real_video_files)
@@ -161,66 +313,102 @@ class RealVideoDataset(Dataset):
         video_name = os.path.basename(real_video_file)
         return {'video': real_video_tensor, 'file_name': video_name }
 
+    def frame_shape(self, index):
+        # (T, H, W) that _load_video will return, from a single reader. H and W are read
+        # off one decoded frame rather than container metadata, since another demuxer
+        # may disagree with decord on rotation or SAR and break default_collate
+        decord_vr = VideoReader(self.real_video_files[index], ctx=cpu(0), num_threads=1)
+        time = len(
+            _compute_frame_plan(len(decord_vr), self.num_frames, self.sample_rate, 4)
+        )
+        height, width, _ = decord_vr[0].shape
+        return time, height, width
+
     def _load_video(self, video_path):
-        num_frames = self.num_frames
-        sample_rate = self.sample_rate
-        decord_vr = VideoReader(video_path, ctx=cpu(0))
+        decord_vr = VideoReader(video_path, ctx=_get_decord_ctx(self.decode_device))
         total_frames = len(decord_vr)
-        sample_frames_len = sample_rate * num_frames
-
-        if total_frames > sample_frames_len:
-            s = 0
-            e = s + sample_frames_len
-            num_frames = num_frames
-        else:
-            s = 0
-            e = total_frames
-            num_frames = int(total_frames / sample_frames_len * num_frames)
+        # frames beyond the last 4k + 1 would be cropped later, so never decode them
+        frame_id_list = _compute_frame_plan(
+            total_frames, self.num_frames, self.sample_rate, 4
+        )
+        if total_frames <= self.sample_rate * self.num_frames:
             print(
-                f"sample_frames_len {sample_frames_len}, only can sample {num_frames * sample_rate}",
+                f"sample_frames_len {self.sample_rate * self.num_frames}, only can sample {len(frame_id_list) * self.sample_rate}",
                 video_path,
                 total_frames,
             )
 
-        frame_id_list = np.linspace(s, e - 1, num_frames, dtype=int)
-        video_data = decord_vr.get_batch(frame_id_list).asnumpy()
-        video_data = torch.from_numpy(video_data)
-        video_data = video_data.permute(3, 0, 1, 2)
-        return _preprocess(
-            video_data, short_size=self.short_size, crop_size=self.crop_size
+        video_data = _decode_frames(
+            decord_vr, video_path, frame_id_list, self.decode_device
         )
+        video_data = video_data.permute(3, 0, 1, 2)
+        return video_data
 
     def _combine_without_prefix(self, folder_path, prefix="."):
-        folder = []
-        for name in os.listdir(folder_path):
-            if name[0] == prefix:
-                continue
-            folder.append(os.path.join(folder_path, name))
-        folder.sort()
-        return folder
+        # scandir yields ready-made paths, no per-entry join or stat
+        with os.scandir(folder_path) as entries:
+            return sorted(
+                entry.path for entry in entries if not entry.name.startswith(prefix)
+            )
+
+
+def _normalize_video(video, dtype=torch.float16):
+    # uint8 [0, 255] -> [-1, 1]: a single cast, then in-place ops with no fp32 temporaries
+    return video.to(dtype).mul_(2.0 / 255.0).sub_(1.0)
+
+
+class FrameShapeBatchSampler(Sampler):
+    def __init__(self, frame_shapes, batch_size, drop_last=False):
+        self.batch_size = batch_size
+        self.drop_last = drop_last
+        buckets = defaultdict(list)
+        for index, frame_shape in enumerate(frame_shapes):
+            buckets[frame_shape].append(index)
+        self.buckets = list(buckets.values())
+
+    def __iter__(self):
+        for indices in self.buckets:
+            for start in range(0, len(indices), self.batch_size):
+                batch = indices[start : start + self.batch_size]
+                if self.drop_last and len(batch) < self.batch_size:
+                    continue
+                yield batch
+
+    def __len__(self):
+        if self.drop_last:
+            return sum(len(indices) // self.batch_size for indices in self.buckets)
+        return sum(
+            math.ceil(len(indices) / self.batch_size) for indices in self.buckets
+        )
 
 
 def _preprocess(video_data, short_size=128, crop_size=None):
-    transform = Compose(
-        [
-            Lambda(lambda x: ((x / 255.0)*2 - 1)),
-            ShortSideScale(size=short_size),
-            (
-                CenterCropVideo(crop_size=crop_size)
-                if crop_size is not None
-                else Lambda(lambda x: x)
-            ),
+    # (B, C, T, H, W) on device: one bilinear resize over all frames of the batch
+    batch_size, channels, time, height, width = video_data.shape
+    if width < height:
+        new_height = int(math.floor(height / width * short_size))
+        new_width = short_size
+    else:
+        new_height = short_size
+        new_width = int(math.floor(width / height * short_size))
+    video_outputs = F.interpolate(
+        video_data.flatten(0, 1),
+        size=(new_height, new_width),
+        mode="bilinear",
+        align_corners=False,
+    ).view(batch_size, channels, time, new_height, new_width)
+    if crop_size is not None:
+        top = int(round((new_height - crop_size) / 2.0))
+        left = int(round((new_width - crop_size) / 2.0))
+        video_outputs = video_outputs[
+            ..., top : top + crop_size, left : left + crop_size
         ]
-    )
-    video_outputs = transform(video_data)
     video_outputs = _format_video_shape(video_outputs)
     return video_outputs
 
 
-def _format_video_shape(video, time_compress=4, spatial_compress=8):
-    time = video.shape[1]
-    height = video.shape[2]
-    width = video.shape[3]
+@njit(cache=True)
+def _compute_video_shape(time, height, width, time_compress, spatial_compress):
     new_time = (
         (time - 1 - (time - 1) % time_compress)
         if (time - 1) % time_compress != 0
@@ -234,7 +422,32 @@ def _format_video_shape(video, time_compress=4, spatial_compress=8):
     new_width = (
         (width - (width) % spatial_compress) if width % spatial_compress != 0 else width
     )
-    return video[:, :new_time, :new_height, :new_width]
+    return new_time, new_height, new_width
+
+
+@njit(cache=True)
+def _compute_frame_plan(total_frames, num_frames, sample_rate, time_compress):
+    sample_frames_len = sample_rate * num_frames
+    s = 0
+    if total_frames > sample_frames_len:
+        e = s + sample_frames_len
+    else:
+        e = total_frames
+        num_frames = int(total_frames / sample_frames_len * num_frames)
+    # integer form of np.linspace(s, e - 1, num_frames, dtype=int)
+    if num_frames > 1:
+        frame_id_list = s + np.arange(num_frames) * (e - 1 - s) // (num_frames - 1)
+    else:
+        frame_id_list = np.full(num_frames, s)
+    new_time, _, _ = _compute_video_shape(num_frames, 1, 1, time_compress, 1)
+    return frame_id_list[:new_time]
+
+
+def _format_video_shape(video, time_compress=4, spatial_compress=8):
+    new_time, new_height, new_width = _compute_video_shape(
+        video.shape[-3], video.shape[-2], video.shape[-1], time_compress, spatial_compress
+    )
+    return video[..., :new_time, :new_height, :new_width]
 
 
 @torch.no_grad()
@@ -251,7 +464,17 @@ def main(args: argparse.Namespace):
     sample_fps = args.sample_fps
     batch_size = args.batch_size
     num_workers = args.num_workers
+    prefetch_factor = args.prefetch_factor
+    num_save_workers = args.num_save_workers
     subset_size = args.subset_size
+    decode_device = args.decode_device
+    use_nvenc = args.video_encoder == "h264_nvenc"
+    dtype = {"fp16": torch.float16, "bf16": torch.bfloat16}[args.dtype]
+
+    if use_nvenc and StreamWriter is None:
+        raise ImportError(
+            "To encode with NVENC, please install torchaudio built with FFmpeg support."
+        )
     
     if not os.path.exists(args.generated_video_dir):
         os.makedirs(args.generated_video_dir, exist_ok=True)
@@ -259,7 +482,16 @@ def main(args: argparse.Namespace):
     # ---- Load Model ----
     device = args.device
     vqvae = CausalVAEModel.load_from_checkpoint(ckpt)
-    vqvae = vqvae.half().to(device)
+    vqvae = vqvae.to(device, dtype=dtype)
+    if args.compile:
+        # _format_video_shape keeps clip shapes fixed, so each shape is captured once
+        # as a static graph and replayed through CUDA graphs
+        vqvae.encode = torch.compile(
+            vqvae.encode, mode="reduce-overhead", fullgraph=False, dynamic=False
+        )
+        vqvae.decode = torch.compile(
+            vqvae.decode, mode="reduce-overhead", fullgraph=False, dynamic=False
+        )
     # ---- Load Model ----
 
     # ---- Prepare Dataset ----
@@ -269,28 +501,87 @@ def main(args: argparse.Namespace):
         sample_rate=sample_rate,
         crop_size=crop_size,
         resolution=resolution,
+        decode_device=decode_device,
     )
     
+    decode_on_gpu = torch.device(decode_device).type == "cuda"
+    if decode_on_gpu and dataset.real_video_files:
+        # the pinned decord wheel is CPU-only and only fails once a GPU reader is opened
+        try:
+            VideoReader(
+                dataset.real_video_files[0], ctx=_get_decord_ctx(decode_device)
+            )
+        except DECORDError as e:
+            raise RuntimeError(
+                "To decode on the GPU, please install decord built with CUDA support, "
+                "or use --decode_device cpu."
+            ) from e
+
     if subset_size:
         indices = range(subset_size)
         dataset = Subset(dataset, indices=indices)
         
+    if decode_on_gpu:
+        # CUDA contexts do not survive fork, so NVDEC decoding stays in the main process
+        num_workers = 0
+    if batch_size > 1:
+        # clips of different shapes cannot be stacked, batch only identical (T, H, W)
+        if isinstance(dataset, Subset):
+            frame_shapes = [dataset.dataset.frame_shape(i) for i in dataset.indices]
+        else:
+            frame_shapes = [dataset.frame_shape(i) for i in range(len(dataset))]
+        batch_kwargs = dict(
+            batch_sampler=FrameShapeBatchSampler(frame_shapes, batch_size)
+        )
+    else:
+        batch_kwargs = dict(batch_size=batch_size)
+    pin_memory = torch.device(device).type == "cuda" and not decode_on_gpu
     dataloader = DataLoader(
-        dataset, batch_size=batch_size, pin_memory=True, num_workers=num_workers
+        dataset,
+        **batch_kwargs,
+        pin_memory=pin_memory,
+        pin_memory_device=device if pin_memory else "",
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,
+        prefetch_factor=prefetch_factor if num_workers > 0 else None,
     )
     # ---- Prepare Dataset
 
     # ---- Inference ----
+    copy_stream = (
+        torch.cuda.Stream(device) if torch.device(device).type == "cuda" else None
+    )
+    save_pool = ThreadPoolExecutor(max_workers=num_save_workers)
+    pending_saves: Deque[Future] = deque()
     for batch in tqdm(dataloader):
         x, file_names = batch['video'], batch['file_name']
-        x = x.half().to(device)
+        x = x.to(device, non_blocking=True)
+        x = _normalize_video(x, dtype)
+        x = _preprocess(x, short_size=resolution, crop_size=crop_size)
         latents = vqvae.encode(x)
-        video_recon = vqvae.decode(latents.sample().half())
-        for idx, video in enumerate(video_recon):
-            output_path = os.path.join(generated_video_dir, file_names[idx])
-            custom_to_video(
-                video, fps=sample_fps / sample_rate, output_file=output_path
-            )
+        video_recon = vqvae.decode(latents.sample())
+        frames = _to_uint8_frames(video_recon, channels_last=not use_nvenc)
+        if use_nvenc:
+            host_frames, copy_done = frames, None
+        else:
+            host_frames, copy_done = _copy_to_host(frames, copy_stream)
+        # earlier batches are written to disk while this one runs on the GPU; cap the
+        # batches in flight so pinned host buffers do not pile up
+        while len(pending_saves) >= num_save_workers:
+            pending_saves.popleft().result()
+        pending_save = save_pool.submit(
+            _save_videos,
+            host_frames,
+            copy_done,
+            file_names,
+            generated_video_dir,
+            sample_fps / sample_rate,
+            use_nvenc,
+        )
+        pending_saves.append(pending_save)
+    for pending_save in pending_saves:
+        pending_save.result()
+    save_pool.shutdown()
     # ---- Inference ----
 
 if __name__ == "__main__":
@@ -305,9 +596,19 @@ if __name__ == "__main__":
     parser.add_argument("--sample_rate", type=int, default=1)
     parser.add_argument("--batch_size", type=int, default=1)
     parser.add_argument("--num_workers", type=int, default=8)
+    parser.add_argument("--prefetch_factor", type=int, default=4)
+    parser.add_argument("--num_save_workers", type=int, default=4)
     parser.add_argument("--subset_size", type=int, default=None)
     parser.add_argument("--device", type=str, default="cuda")
+    parser.add_argument("--decode_device", type=str, default="cpu")
+    parser.add_argument("--dtype", type=str, default="fp16", choices=["fp16", "bf16"])
+    parser.add_argument("--compile", action="store_true")
+    parser.add_argument(
+        "--video_encoder", type=str, default="opencv", choices=["opencv", "h264_nvenc"]
+    )
 
     args = parser.parse_args()
+    if args.num_save_workers < 1:
+        parser.error("--num_save_workers must be at least 1")
     main(args)
     
@@ -30,9 +30,7 @@ class DiagonalGaussianDistribution(object):
             )
 
     def sample(self):
-        x = self.mean + self.std * torch.randn(self.mean.shape).to(
-            device=self.parameters.device
-        )
+        x = self.mean + self.std * torch.randn_like(self.mean)
         return x
 
     def kl(self, other=None):
@@ -76,31 +76,22 @@ class BlockwiseConv3d(nn.Module):
         self.stride = stride
         self.block_step = block_step
         self.conv = nn.Conv3d(chan_in, chan_out, kernel_size, stride, padding=0)
-
-    def forward(self, x):
-        device = x.device
-        batch_size = x.shape[0]
-        dtype = x.dtype
-        padded_x = nn.functional.pad(x, self.tile_padding)
-        del x
-        time_length = get_new_size(
-            self.kernel_size[0], self.stride[0], padded_x.shape[2]
+        self._block_plans = {}
+
+    def _get_block_plan(self, input_size):
+        # the tiling only depends on the padded input size, so it is worked out
+        # once per shape and replayed on every later call
+        input_size = tuple(input_size)
+        if input_size in self._block_plans:
+            return self._block_plans[input_size]
+
+        origin_time_length, origin_height_length, origin_width_length = input_size
+        output_size = (
+            get_new_size(self.kernel_size[0], self.stride[0], origin_time_length),
+            get_new_size(self.kernel_size[1], self.stride[1], origin_height_length),
+            get_new_size(self.kernel_size[2], self.stride[2], origin_width_length),
         )
-        height_length = get_new_size(
-            self.kernel_size[1], self.stride[1], padded_x.shape[3]
-        )
-        width_length = get_new_size(
-            self.kernel_size[2], self.stride[2], padded_x.shape[4]
-        )
-
-        result = torch.zeros(
-            (batch_size, self.chan_out, time_length, height_length, width_length), device=device, dtype=dtype
-        )
-
-        origin_time_length = padded_x.shape[2]
-        origin_height_length = padded_x.shape[3]
-        origin_width_length = padded_x.shape[4]
-
+        blocks = []
         for time in range(
             0,
             get_max_step(self.kernel_size[0], self.stride[0], origin_time_length),
@@ -142,21 +133,37 @@ class BlockwiseConv3d(nn.Module):
                     width_end = cal_idx_by_step_end(
                         self.kernel_size[2], self.stride[2], width + self.block_step[2]
                     )
-                    block = padded_x[
-                        :,
-                        :,
-                        time_start : min(time_end, origin_time_length),
-                        height_start : min(height_end, origin_height_length),
-                        width_start : min(width_end, origin_width_length),
-                    ]
-                    result_block = self.conv(block)
-                    result[
-                        :,
-                        :,
-                        time : time + self.block_step[0],
-                        height : height + self.block_step[1],
-                        width : width + self.block_step[2],
-                    ] = result_block
+                    block_index = (
+                        slice(None),
+                        slice(None),
+                        slice(time_start, min(time_end, origin_time_length)),
+                        slice(height_start, min(height_end, origin_height_length)),
+                        slice(width_start, min(width_end, origin_width_length)),
+                    )
+                    result_index = (
+                        slice(None),
+                        slice(None),
+                        slice(time, time + self.block_step[0]),
+                        slice(height, height + self.block_step[1]),
+                        slice(width, width + self.block_step[2]),
+                    )
+                    blocks.append((block_index, result_index))
+        self._block_plans[input_size] = (output_size, blocks)
+        return output_size, blocks
+
+    def forward(self, x):
+        device = x.device
+        batch_size = x.shape[0]
+        dtype = x.dtype
+        padded_x = nn.functional.pad(x, self.tile_padding)
+        del x
+        output_size, blocks = self._get_block_plan(padded_x.shape[2:])
+
+        result = torch.zeros(
+            (batch_size, self.chan_out, *output_size), device=device, dtype=dtype
+        )
+        for block_index, result_index in blocks:
+            result[result_index] = self.conv(padded_x[block_index])
         return result
 
     def set_weights(self, weights, bias):